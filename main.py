@@ -6,15 +6,17 @@ It retrieves book information, including titles, prices, and availability, and d
 in a scrollable text area. Users can also save the scraped data to a JSON file.
 """
 
-import json
+import multiprocessing
 import threading
-import time
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 from datetime import datetime
+from contextlib import closing
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
+import orjson
+
+from scraper_core import BookStore, PageScraper
 
 
 class WebScraperApp:
@@ -36,17 +38,26 @@ class WebScraperApp:
         self.root.title("Web Scraper")
         self.root.geometry("800x600")
 
-        self.timeout = 10
-        self.sleep_time = 1
+        # Scraped pages and books are written to disk as they arrive; the stored pages also
+        # serve as the cache for conditional requests
+        self.book_store = BookStore()
+
+        # Only scrapes from this session are saved; the stored pages stay cached
+        self.book_store.reset_scrape()
+
+        # Fetching and parsing of pages
+        self.scraper = PageScraper(self.book_store)
 
         # Variables
         self.url_var = tk.StringVar(value="https://books.toscrape.com/catalogue/")
         self.start_page = tk.IntVar(value=1)
         self.end_page = tk.IntVar(value=50)
         self.is_scraping = False
-        self.book_data = []
+        self.is_closing = False
+        self.scrape_thread = None
 
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def create_widgets(self) -> None:
         """Creates widgets and builds the application's UI."""
@@ -101,15 +112,15 @@ class WebScraperApp:
         if self.is_scraping:
             return
 
-        self.book_data = []
+        self.book_store.reset_scrape()
         self.result_text.delete(1.0, tk.END)
         self.is_scraping = True
         self.start_btn.config(text="Scraping...")
 
         # Start scraping in a separate thread
-        thread = threading.Thread(target=self.scrape_data)
-        thread.daemon = True
-        thread.start()
+        self.scrape_thread = threading.Thread(target=self.scrape_data)
+        self.scrape_thread.daemon = True
+        self.scrape_thread.start()
 
     def scrape_data(self) -> None:
         """Scrapes data from the specified page range.
@@ -121,62 +132,67 @@ class WebScraperApp:
             start = self.start_page.get()
             end = self.end_page.get()
             total_pages = end - start + 1
-
-            for page_num in range(start, end + 1):
-                if not self.is_scraping:
-                    break
-
-                url = f"{self.url_var.get()}page-{page_num}.html"
-                self.status_var.set(f"Scraping page {page_num}...")
-
-                response = requests.get(url, timeout=self.timeout)
-                response.raise_for_status()
-
-                soup = BeautifulSoup(response.content, "html.parser")
-                book_entries = soup.find_all("article", class_="product_pod")
-
-                for entry in book_entries:
-                    book = {
-                        "title": entry.h3.a["title"],
-                        "price": entry.find("p", class_="price_color").text.strip(),
-                        "availability": entry.find("p", class_="instock availability").text.strip()
-                    }
-                    self.book_data.append(book)
-
-                    # Update result text
-                    self.result_text.insert(tk.END, f"Title: {book['title']}\n")
-                    self.result_text.insert(tk.END, f"Price: {book['price']}\n")
-                    self.result_text.insert(tk.END, f"Availability: {book['availability']}\n")
-                    self.result_text.insert(tk.END, "-" * 50 + "\n")
-                    self.result_text.see(tk.END)
-
-                # Update progress
-                progress = (page_num - start + 1) / total_pages * 100
-                self.progress_var.set(progress)
-
-                time.sleep(self.sleep_time)
+            base_url = self.url_var.get()
+
+            # Pages are scraped concurrently but arrive in page order
+            with closing(self.scraper.iter_pages(base_url, start, end)) as page_books:
+                for page_num, books in page_books:
+                    if not self.is_scraping:
+                        break
+
+                    self.status_var.set(f"Scraping page {page_num}...")
+
+                    # Update result text once per page, on the UI thread
+                    page_text = "".join(
+                        f"Title: {book.title}\n"
+                        f"Price: {book.price}\n"
+                        f"Availability: {book.availability}\n"
+                        + "-" * 50 + "\n"
+                        for book in books
+                    )
+                    self.root.after(0, self.append_result, page_text)
+
+                    # Update progress
+                    progress = (page_num - start + 1) / total_pages * 100
+                    self.progress_var.set(progress)
+                else:
+                    # The catalogue may have fewer pages than the requested end page
+                    self.progress_var.set(100)
 
             self.status_var.set("Scraping completed!")
-            messagebox.showinfo("Complete", "Scraping process has finished!")
+            if not self.is_closing:
+                messagebox.showinfo("Complete", "Scraping process has finished!")
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             self.status_var.set(f"Error: {str(e)}")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            if not self.is_closing:
+                messagebox.showerror("Error", f"An error occurred: {str(e)}")
         except Exception as e:
             self.status_var.set(f"Error: {str(e)}")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            if not self.is_closing:
+                messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
         finally:
             self.is_scraping = False
             self.start_btn.config(text="Start Scraping")
 
+    def append_result(self, text: str) -> None:
+        """Appends text to the result area and scrolls to the end. Must run on the UI thread.
+
+        Args:
+            text (str): The text to append.
+        """
+
+        self.result_text.insert(tk.END, text)
+        self.result_text.see(tk.END)
+
     def save_data(self) -> None:
         """Saves the scraped data to a JSON file.
 
         Displays a warning if there is no data to save.
         """
 
-        if not self.book_data:
+        if not self.book_store.count():
             messagebox.showwarning("Warning", "No data to save!")
             return
 
@@ -184,13 +200,35 @@ class WebScraperApp:
         filename = f"scraped_data_{timestamp}.json"
 
         try:
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(self.book_data, f, indent=2, ensure_ascii=False)
+            with open(filename, "wb") as f:
+                f.write(orjson.dumps(self.book_store.books(), option=orjson.OPT_INDENT_2))
             messagebox.showinfo("Success", f"Data saved to {filename}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save data: {str(e)}")
 
+    def on_close(self) -> None:
+        """Stops any running scrape, releases the client and workers and destroys the window.
+
+        If a scrape is still running, the window is hidden and closing is retried until the
+        scrape thread has stopped, so the thread never uses a closed store or destroyed widget.
+        """
+
+        self.is_scraping = False
+        self.is_closing = True
+
+        if self.scrape_thread is not None and self.scrape_thread.is_alive():
+            self.root.withdraw()
+            self.root.after(100, self.on_close)
+            return
+
+        self.scraper.close()
+        self.book_store.close()
+        self.root.destroy()
+
 if __name__ == "__main__":
+    # Required for the parse worker processes in executables built with PyInstaller
+    multiprocessing.freeze_support()
+
     root = tk.Tk()
     app = WebScraperApp(root)
     root.mainloop()
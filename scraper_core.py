@@ -0,0 +1,471 @@
+"""
+This module provides the scraping logic used by the application, independent of the user interface.
+
+It fetches catalogue pages from the website, extracts book information, including titles, prices,
+and availability, from them and stores the results in an SQLite database, which also serves as a
+cache between runs so that unchanged pages are not downloaded and parsed again.
+"""
+
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import httpx
+from lxml import etree, html
+
+# The pages do not declare a charset, so tell the parser they are UTF-8
+HTML_PARSER = html.HTMLParser(encoding="utf-8")
+
+
+@dataclass(slots=True)
+class Book:
+    """Information about a single book in the catalogue."""
+
+    title: str
+    price: str
+    availability: str
+
+
+# XPath expressions used to extract book information, compiled once at import time
+BOOK_XPATH = etree.XPath('//article[@class="product_pod"]')
+TITLE_XPATH = etree.XPath("string(.//h3/a/@title)")
+PRICE_XPATH = etree.XPath('normalize-space(.//p[@class="price_color"])')
+AVAILABILITY_XPATH = etree.XPath('normalize-space(.//p[@class="instock availability"])')
+PAGER_XPATH = etree.XPath('normalize-space(//ul[@class="pager"]/li[@class="current"])')
+
+# Responses that are retried with exponential backoff, and how often
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+RETRY_AFTER_STATUSES = frozenset((429, 503))
+# Transient transport errors; configuration errors such as a URL without a scheme are not retried
+RETRY_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.3
+# Longest Retry-After worth waiting for; a server asking for more is treated as a failure
+MAX_RETRY_AFTER = 30
+
+# Matches the total in the pager text, e.g. "Page 1 of 50"
+PAGE_COUNT_PATTERN = re.compile(r"of (\d+)")
+
+
+def parse_page(content: bytes) -> dict:
+    """Extracts the book information and the total number of pages from the HTML of a page.
+
+    Defined at module level so that it can be run in a worker process.
+
+    Args:
+        content (bytes): The raw HTML content of the page.
+
+    Returns:
+        dict: "books", a Book for each book on the page, and
+            "page_count", the number of pages in the catalogue or None if there is no pager.
+    """
+
+    tree = html.fromstring(content, parser=HTML_PARSER)
+
+    books = [
+        Book(
+            title=TITLE_XPATH(entry),
+            price=PRICE_XPATH(entry),
+            availability=AVAILABILITY_XPATH(entry)
+        )
+        for entry in BOOK_XPATH(tree)
+    ]
+
+    match = PAGE_COUNT_PATTERN.search(PAGER_XPATH(tree))
+    page_count = int(match.group(1)) if match else None
+
+    return {"books": books, "page_count": page_count}
+
+
+def retry_delay(response: httpx.Response | None, attempt: int) -> float:
+    """Returns how long to wait before retrying a failed request.
+
+    A Retry-After header on a 429 or 503 response is honoured, given either in seconds or as
+    an HTTP date. Otherwise the delay grows exponentially with the attempt number.
+
+    Args:
+        response (httpx.Response | None): The failed response, or None if no response arrived.
+        attempt (int): The number of the failed attempt, starting at 0.
+
+    Returns:
+        float: The delay in seconds.
+    """
+
+    if response is not None and response.status_code in RETRY_AFTER_STATUSES:
+        retry_after = response.headers.get("Retry-After", "").strip()
+        if retry_after.isdigit():
+            return float(retry_after)
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            pass
+        else:
+            return max(0.0, retry_at.timestamp() - time.time())
+
+    return BACKOFF_FACTOR * 2 ** attempt
+
+
+def create_client(max_connections: int, timeout: float) -> httpx.Client:
+    """Creates an HTTP/2 client that multiplexes requests over shared connections.
+
+    Failed requests are not retried by the client; fetch_page retries them with backoff.
+
+    Args:
+        max_connections (int): The maximum number of connections to open to the website.
+        timeout (float): The timeout of each HTTP request in seconds.
+
+    Returns:
+        httpx.Client: The configured client.
+    """
+
+    transport = httpx.HTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_connections=max_connections)
+    )
+
+    # Ask for compressed pages; Brotli decoding needs the brotli package
+    headers = {
+        "Accept-Encoding": "gzip, deflate, br",
+        "User-Agent": "books-to-scrape/1.0"
+    }
+    return httpx.Client(transport=transport, headers=headers, timeout=timeout)
+
+
+class BookStore:
+    """Stores scraped pages and their books in an SQLite database.
+
+    Each page is stored with its ETag / Last-Modified validators, page count and books as soon
+    as it has been parsed. The stored pages act as the cache for conditional requests, and the
+    pages covered by the current scrape are marked with their position so the scraped books can
+    be exported from the database. Safe to use from multiple threads.
+    """
+
+    def __init__(self, db_file: str = "books.db") -> None:
+        """Initialization method. Creates the tables if they do not exist yet.
+
+        Args:
+            db_file (str): The SQLite database file.
+        """
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, page_count INTEGER, "
+            "position INTEGER)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS books "
+            "(url TEXT, title TEXT, price TEXT, availability TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS books_url ON books (url)")
+
+    def reset_scrape(self) -> None:
+        """Forgets which pages the previous scrape covered. Stored pages stay cached."""
+
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE pages SET position = NULL")
+
+    def mark_scraped(self, url: str, position: int) -> None:
+        """Marks a stored page as part of the current scrape.
+
+        Args:
+            url (str): The URL of the page.
+            position (int): The position of the page in the scrape, used to order the export.
+        """
+
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE pages SET position = ? WHERE url = ?", (position, url))
+
+    def validators(self, url: str) -> tuple[str | None, str | None] | None:
+        """Returns the validators of a stored page.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            tuple[str | None, str | None] | None: The ETag and Last-Modified values, or None if
+                the page is not stored.
+        """
+
+        with self.lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+    def load_page(self, url: str) -> dict:
+        """Returns a stored page in the form returned by parse_page.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            dict: "books" and "page_count" of the page.
+        """
+
+        with self.lock:
+            (page_count,) = self.conn.execute(
+                "SELECT page_count FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            rows = self.conn.execute(
+                "SELECT title, price, availability FROM books WHERE url = ? ORDER BY rowid", (url,)
+            ).fetchall()
+        return {"books": [Book(*row) for row in rows], "page_count": page_count}
+
+    def save_page(self, url: str, etag: str | None, last_modified: str | None, page: dict) -> None:
+        """Stores a parsed page and its books in a single transaction, replacing any older copy.
+
+        Args:
+            url (str): The URL of the page.
+            etag (str | None): The ETag of the response.
+            last_modified (str | None): The Last-Modified value of the response.
+            page (dict): The page as returned by parse_page.
+        """
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO pages (url, etag, last_modified, page_count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET etag = excluded.etag, "
+                "last_modified = excluded.last_modified, page_count = excluded.page_count",
+                (url, etag, last_modified, page["page_count"])
+            )
+            self.conn.execute("DELETE FROM books WHERE url = ?", (url,))
+            self.conn.executemany(
+                "INSERT INTO books (url, title, price, availability) VALUES (?, ?, ?, ?)",
+                [(url, book.title, book.price, book.availability) for book in page["books"]]
+            )
+
+    def count(self) -> int:
+        """Returns the number of books in the current scrape."""
+
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM books JOIN pages USING (url) "
+                "WHERE pages.position IS NOT NULL"
+            ).fetchone()[0]
+
+    def books(self) -> list[Book]:
+        """Returns the books of the current scrape in page order."""
+
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT books.title, books.price, books.availability "
+                "FROM books JOIN pages USING (url) WHERE pages.position IS NOT NULL "
+                "ORDER BY pages.position, books.rowid"
+            ).fetchall()
+        return [Book(*row) for row in rows]
+
+    def close(self) -> None:
+        """Closes the database connection."""
+
+        with self.lock:
+            self.conn.close()
+
+
+class RateLimiter:
+    """Spaces out the start of calls so that at most one starts per interval.
+
+    Time slots are reserved when a call asks for one, not when the previous call finishes,
+    so the wait overlaps with whatever the caller does between requests (e.g. parsing).
+    Safe to use from multiple threads.
+    """
+
+    def __init__(self, interval: float) -> None:
+        """Initialization method.
+
+        Args:
+            interval (float): The minimum number of seconds between two starts.
+        """
+
+        self.interval = interval
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Blocks until the caller's reserved time slot has been reached."""
+
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+
+        time.sleep(start - now)
+
+
+class PageScraper:
+    """Scrapes book information from a range of catalogue pages.
+
+    Pages are fetched concurrently over a shared HTTP/2 client and parsed in worker processes.
+    Parsed pages are kept in a BookStore together with their ETag / Last-Modified validators,
+    so later runs send conditional requests and reuse the stored books when a page comes back
+    unchanged.
+    """
+
+    def __init__(
+        self,
+        store: BookStore,
+        timeout: float = 10,
+        max_workers: int = 4,
+        request_interval: float = 0.25
+    ) -> None:
+        """Initialization method.
+
+        Args:
+            store (BookStore): The store that caches pages and records the current scrape.
+            timeout (float): The timeout of each HTTP request in seconds.
+            max_workers (int): The number of pages fetched concurrently.
+            request_interval (float): The minimum number of seconds between two requests.
+        """
+
+        self.store = store
+        self.max_workers = max_workers
+        # Pages fetched or being fetched but not yet consumed; bounds iter_pages' read-ahead
+        self.max_pending = 2 * max_workers
+        self.client = create_client(max_workers, timeout)
+
+        # Start at most one request every request_interval seconds across all workers
+        self.rate_limiter = RateLimiter(request_interval)
+
+        # Parsing is CPU-bound, so it runs in worker processes reused across scrapes. The
+        # workers are spawned rather than forked, since forking this multi-threaded process
+        # (Tk, scrape and fetch threads) can deadlock
+        self.parse_executor = ProcessPoolExecutor(
+            max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def iter_pages(self, base_url: str, start: int, end: int) -> Iterator[tuple[int, list[Book]]]:
+        """Scrapes the pages from start to end, both inclusive.
+
+        The first page is scraped on its own to read the total number of pages from its pager,
+        and end is lowered to that total so no requests are wasted on pages that do not exist.
+        The remaining pages are scraped concurrently but yielded in page order. At most
+        max_pending pages are in flight or waiting to be consumed, so a slow consumer holds
+        back fetching instead of letting results pile up. A page is marked as part of the
+        current scrape in the store once the consumer moves past it, so pages left unconsumed
+        when the iterator is closed early are not exported.
+
+        Args:
+            base_url (str): The base URL the page file names are appended to.
+            start (int): The number of the first page.
+            end (int): The number of the last page, if the catalogue has that many.
+
+        Yields:
+            tuple[int, list[Book]]: The page number and the books on that page.
+        """
+
+        if start > end:
+            return
+
+        first_url = f"{base_url}page-{start}.html"
+        first_page = self.scrape_page(first_url)
+        if first_page["page_count"]:
+            end = min(end, first_page["page_count"])
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending = deque([(start, first_url, lambda: first_page)])
+        page_nums = iter(range(start + 1, end + 1))
+        try:
+            while pending:
+                while len(pending) < self.max_pending:
+                    page_num = next(page_nums, None)
+                    if page_num is None:
+                        break
+                    url = f"{base_url}page-{page_num}.html"
+                    pending.append((page_num, url, executor.submit(self.scrape_page, url).result))
+
+                page_num, url, result = pending.popleft()
+                yield page_num, result()["books"]
+                self.store.mark_scraped(url, page_num)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def scrape_page(self, url: str) -> dict:
+        """Fetches and parses a single page. Runs on a worker thread of iter_pages.
+
+        The HTML is parsed in the process pool so that several pages can be parsed in
+        parallel while other workers keep downloading.
+
+        Args:
+            url (str): The URL of the page to scrape.
+
+        Returns:
+            dict: The books on the page and the page count, as returned by parse_page.
+        """
+
+        response = self.fetch_page(url)
+
+        if response.status_code == 304:
+            # Page is unchanged since the last run; reuse the stored result
+            return self.store.load_page(url)
+
+        page = self.parse_executor.submit(parse_page, response.content).result()
+        self.store.save_page(
+            url, response.headers.get("ETag"), response.headers.get("Last-Modified"), page
+        )
+        return page
+
+    def fetch_page(self, url: str) -> httpx.Response:
+        """Fetches a single page.
+
+        If the page was fetched before, a conditional request is sent so that an unchanged
+        page comes back as 304 Not Modified without a body. Transient transport errors
+        (RETRY_ERRORS: connection failures, timeouts, broken reads) and responses with a status in RETRY_STATUSES are
+        retried with exponential backoff, or after the delay the server asks for in Retry-After.
+        If the server asks for more than MAX_RETRY_AFTER seconds, the request fails instead.
+
+        Args:
+            url (str): The URL of the page to fetch.
+
+        Returns:
+            httpx.Response: The response, with status 200 or 304.
+
+        Raises:
+            httpx.HTTPError: If the page could not be fetched.
+        """
+
+        headers = {}
+        validators = self.store.validators(url)
+        if validators:
+            etag, last_modified = validators
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        for attempt in range(MAX_RETRIES + 1):
+            self.rate_limiter.wait()
+            try:
+                response = self.client.get(url, headers=headers)
+            except RETRY_ERRORS:
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(retry_delay(None, attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                break
+            delay = retry_delay(response, attempt)
+            if delay > MAX_RETRY_AFTER:
+                break
+            time.sleep(delay)
+
+        # httpx treats every non-2xx status as an error, including 304
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def close(self) -> None:
+        """Closes the HTTP client and shuts down the parse worker processes."""
+
+        self.client.close()
+        self.parse_executor.shutdown(wait=False, cancel_futures=True)